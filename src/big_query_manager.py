@@ -6,6 +6,8 @@ SQL queries and optionally save query results to a specified destination table.
 """
 
 import os
+import time
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from google.cloud import bigquery
 from google.cloud.bigquery.table import RowIterator
@@ -18,6 +20,9 @@ os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = os.getenv(
 PROJECT_ID = os.getenv("PROJECT_ID")
 DATASET_ID = os.getenv("DATASET_ID")
 
+# Seconds between status checks while a preview query races the full query
+PREVIEW_POLL_INTERVAL = 0.2
+
 
 class BigQueryManager:
     """
@@ -28,10 +33,42 @@ class BigQueryManager:
         self.client = bigquery.Client()
         self.project_id = project_id
         self.dataset_id = dataset_id
+        # Bytes processed and BigQuery execution seconds of the most recent query
+        self.last_query_stats = None
+
+    def dry_run(self, query):
+        """
+        Estimate the number of bytes a query would process without running it.
+        """
+        job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+        query_job = self.client.query(query, job_config=job_config)
+        return query_job.total_bytes_processed or 0
+
+    def start_query(self, query, maximum_bytes_billed=None):
+        """
+        Start a query without waiting for it and return the cancellable job.
+        Jobs that would bill more than maximum_bytes_billed fail instead of running.
+        """
+        job_config = bigquery.QueryJobConfig()
+        if maximum_bytes_billed:
+            job_config.maximum_bytes_billed = int(maximum_bytes_billed)
+        return self.client.query(query, job_config=job_config)
 
-    def execute_query(self, query, destination_table=None):
+    def execute_query(
+        self,
+        query,
+        destination_table=None,
+        on_preview=None,
+        preview_rows=20,
+        preview_max_bytes=None,
+        expiration_seconds=None,
+    ):
         """
         Run a query. Optionally save the results to a table or return the result as a DataFrame.
+        A destination table written with expiration_seconds is deleted by BigQuery after that long.
+        When on_preview is given, a LIMITed preview query runs alongside the full query
+        and its DataFrame is passed to on_preview before the full result is ready;
+        preview_max_bytes caps what the preview may bill.
         """
         job_config = bigquery.QueryJobConfig()
 
@@ -43,8 +80,50 @@ class BigQueryManager:
             job_config.destination = table_ref
             job_config.write_disposition = bigquery.WriteDisposition.WRITE_TRUNCATE
 
+        start = time.perf_counter()
         query_job = self.client.query(query, job_config=job_config)
+
+        # Show the first rows early while the full query finishes
+        if on_preview and not destination_table:
+            preview_query = (
+                f"SELECT * FROM ({query.strip().rstrip(';')}) LIMIT {int(preview_rows)}"
+            )
+            try:
+                preview_job = self.start_query(preview_query, preview_max_bytes)
+            except Exception as e:
+                print(f"Error starting preview query: {e}")
+                preview_job = None
+
+            # Poll both jobs; the preview is dropped once the full result is ready
+            while preview_job is not None and not query_job.done():
+                if preview_job.done():
+                    try:
+                        on_preview(preview_job.result().to_dataframe())
+                    except Exception as e:
+                        print(f"Error running preview query: {e}")
+                    preview_job = None
+                else:
+                    time.sleep(PREVIEW_POLL_INTERVAL)
+            if preview_job is not None:
+                preview_job.cancel()
+
         result: RowIterator = query_job.result()  # Wait for the query to complete
+        # Time spent in BigQuery itself, without client polling and queueing delays
+        if query_job.started and query_job.ended:
+            elapsed = (query_job.ended - query_job.started).total_seconds()
+        else:
+            elapsed = time.perf_counter() - start
+        self.last_query_stats = {
+            "bytes_processed": query_job.total_bytes_processed or 0,
+            "elapsed": elapsed,
+        }
+
+        if destination_table and expiration_seconds:
+            table = self.client.get_table(job_config.destination)
+            table.expires = datetime.now(timezone.utc) + timedelta(
+                seconds=expiration_seconds
+            )
+            self.client.update_table(table, ["expires"])
 
         # Return DataFrame if no destination_table is provided
         if not destination_table:
@@ -52,6 +131,13 @@ class BigQueryManager:
 
         return None
 
+    def delete_table(self, table_name):
+        """
+        Delete a table from the dataset. Missing tables are ignored.
+        """
+        table_ref = f"{self.project_id}.{self.dataset_id}.{table_name}"
+        self.client.delete_table(table_ref, not_found_ok=True)
+
 # # Usage
 # if __name__ == "__main__":
 
@@ -3,8 +3,9 @@ Module for initializing core components of the application.
 
 This module sets up and initializes the following components needed for the application:
 1. **BigQueryManager:** Manages interactions with Google BigQuery for executing SQL queries.
-2. **ChatGoogleGenerativeAI:** Provides an interface to the Gemini LLM for AI-powered
-chat functionalities.
+2. **ChatGoogleGenerativeAI:** Provides an interface to the Gemini LLMs for AI-powered
+chat functionalities, routed through a ModelRouter that tries a fast model first and
+escalates to the large model when needed.
 3. **Chroma Vector Store:** A persistent storage solution for document embeddings,
 used in retrieval-based AI systems.
 """
@@ -14,6 +15,7 @@ from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain_chroma import Chroma
 from big_query_manager import BigQueryManager
+from model_router import ModelRouter, load_schema_catalog
 
 load_dotenv()
 
@@ -34,8 +36,18 @@ async def initialize_components():
     if not gemini_api_key:
         raise ValueError("GEMINI_API_KEY is not set. Please check your .env file.")
 
-    # Initialize LLM
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-pro", api_key=gemini_api_key)
+    # Initialize LLM tiers and route each stage to the fast model first
+    fast_llm = ChatGoogleGenerativeAI(
+        model=os.getenv("GEMINI_FAST_MODEL", "gemini-1.5-flash"),
+        api_key=gemini_api_key,
+    )
+    large_llm = ChatGoogleGenerativeAI(
+        model=os.getenv("GEMINI_LARGE_MODEL", "gemini-1.5-pro"),
+        api_key=gemini_api_key,
+    )
+    llm = ModelRouter(
+        {"fast": fast_llm, "large": large_llm}, catalog=load_schema_catalog()
+    )
 
     # Initialize vector store
     embeddings = GoogleGenerativeAIEmbeddings(
@@ -8,32 +8,57 @@ and handling data processing and visualization based on user queries.
 import pandas as pd
 import altair as alt
 import regex as re
-
-def refine_response(response):
-    """
-    Cleans and refines SQL query responses by removing markdown artifacts such
-    as code block backticks and unnecessary tags.
-    """
-
-    # Remove the 'sql' tag if it exists at the start of the response
-    response = re.sub(r"^sql\s*", "", response)
-
-    # Remove triple backticks or single backticks at both ends
-    response = re.sub(r"^```(.*)```$", r"\1", response, flags=re.DOTALL)
-    response = re.sub(r"^`(.*)`$", r"\1", response, flags=re.DOTALL)
-
-    # Strip any leading or trailing whitespace
-    return response.strip()
+from materialization_advisor import materialization_advisor
+from speculative_executor import speculative_executor, SPECULATIVE_MAX_BYTES
+from sql_utils import refine_response
 
 
-def get_data(bq_manager, reg):
+def get_data(bq_manager, reg, speculation=None, on_preview=None):
     """
     Executes a SQL query using a BigQuery manager instance and returns
-    the results as a Pandas DataFrame.
+    the results as a Pandas DataFrame. A matching speculative job is
+    used instead of a new query, and on_preview receives a LIMITed preview
+    while the full query runs.
     """
 
-    # Execute the BigQuery query
-    data = bq_manager.execute_query(reg)
+    # Use the speculative job's result when it ran the same SQL
+    data = speculative_executor.resolve(speculation, reg)
+    if data is not None:
+        bq_manager.last_query_stats = speculation["stats"]
+        materialization_advisor.record(reg, speculation["stats"])
+    else:
+        # Read a fresh summary table instead when the query shape is materialized
+        rewritten = materialization_advisor.rewrite(reg, bq_manager)
+        data = None
+        if rewritten:
+            try:
+                data = bq_manager.execute_query(rewritten)
+            except Exception as e:
+                # The summary table is missing or unreadable; use the original SQL
+                print(f"Error reading materialized table, running original query: {e}")
+                materialization_advisor.invalidate(reg, bq_manager)
+                rewritten = None
+
+        # Execute the BigQuery query
+        if not rewritten:
+            show_preview = None
+            if on_preview and speculative_executor.should_preview(reg, bq_manager):
+
+                def show_preview(preview):
+                    speculative_executor.record_preview()
+                    on_preview(preview)
+
+            data = bq_manager.execute_query(
+                reg,
+                on_preview=show_preview,
+                preview_max_bytes=SPECULATIVE_MAX_BYTES,
+            )
+        materialization_advisor.record(
+            reg, bq_manager.last_query_stats, rewritten=rewritten is not None
+        )
+
+    # Returned at full width: summaries and chart code may do arithmetic on it.
+    # Only the copy retained in the result store is compacted.
     return data
 
 
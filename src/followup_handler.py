@@ -0,0 +1,272 @@
+"""
+# Conversational Follow-up Module
+
+This module decides whether a follow-up query (e.g. "now sort that by CGPA" or
+"only the Computer Science ones") can be answered locally against the previous
+result, and applies the refinement with pandas instead of generating new SQL
+and running another BigQuery job.
+"""
+
+import pandas as pd
+import regex as re
+
+# Words that signal the user is refining the previous answer rather than asking anew
+FOLLOWUP_MARKERS = re.compile(
+    r"\b(now|only|just|instead|those|these|them|ones)\b"
+    r"|\b(?:sort|order|rank)\w*\s+(?:that|it)\b"
+    r"|^(?:sort|order|rank|filter|top|bottom|first|last|only|just)\b",
+    re.IGNORECASE,
+)
+
+# Follow-ups are split into clauses at separators and before clause keywords;
+# every clause must be recognised in full or the follow-up goes to SQL generation
+CLAUSE_BOUNDARY = re.compile(
+    r"\s*(?:[,;]|\band\b|\bthen\b)\s*"
+    r"|\s+(?=(?:sort|sorted|order|ordered|rank|ranked|with|where|having|only|just|filter)\b"
+    r"|(?:top|first|bottom|last)\s+\d|(?:highest|lowest|largest|smallest)\b)",
+    re.IGNORECASE,
+)
+
+SORT_PATTERN = re.compile(
+    r"^(?:sort|order|rank)\w*\s+(?:(?:that|those|these|them|it|the\s+results?)\s+)?by\s+"
+    r"(?P<column>.+?)(?:\s+(?P<direction>asc\w*|desc\w*|(?:high|low)\w*\s+first))?$",
+    re.IGNORECASE,
+)
+EXTREME_PATTERN = re.compile(
+    r"^(?:the\s+)?(?P<direction>highest|lowest|largest|smallest)\s+(?P<column>.+?)"
+    r"(?:\s+first)?$",
+    re.IGNORECASE,
+)
+LIMIT_PATTERN = re.compile(
+    r"^(?:the\s+)?(?P<which>top|first|bottom|last)\s+(?P<count>\d+)"
+    r"(?:\s+(?:rows|results|records|entries|ones|students|courses|instructors|departments))?"
+    r"(?:\s+by(?:\s+(?P<column>.+))?)?$",
+    re.IGNORECASE,
+)
+COMPARE_PATTERN = re.compile(
+    r"^(?:(?:with|where|having)\s+)?(?:the\s+)?(?P<column>.+?)\s*"
+    r"(?P<op>>=|<=|!=|>|<|=|above|below|over|under|greater than|less than|at least|at most)"
+    r"\s*(?P<value>-?\d+(?:\.\d+)?)$",
+    re.IGNORECASE,
+)
+ONLY_PATTERN = re.compile(
+    r"^(?:only|just|filter\s+(?:to|for|by|on))\s+(?:the\s+)?(?P<value>.+?)"
+    r"(?:\s+(?:ones|one|rows|records|entries|students|courses|instructors|departments))?$",
+    re.IGNORECASE,
+)
+
+# Words that carry no refinement of their own, e.g. "now show me only those"
+FILLER_WORDS = {
+    "now", "show", "list", "give", "get", "display", "keep", "me", "us", "please",
+    "the", "that", "those", "these", "them", "it", "ones", "one", "rows", "results",
+    "only", "just", "instead", "all", "of", "can", "you",
+}
+
+OPERATORS = {
+    ">": "gt",
+    "above": "gt",
+    "over": "gt",
+    "greater than": "gt",
+    "<": "lt",
+    "below": "lt",
+    "under": "lt",
+    "less than": "lt",
+    ">=": "ge",
+    "at least": "ge",
+    "<=": "le",
+    "at most": "le",
+    "=": "eq",
+    "!=": "ne",
+}
+
+
+def _normalize(text):
+    """Lower-cases text and strips everything but letters and digits."""
+    return re.sub(r"[^a-z0-9]", "", str(text).lower())
+
+
+def resolve_column(phrase, data: pd.DataFrame):
+    """
+    Maps a column phrase from the user's query onto a column of the cached result.
+    Returns None when the phrase does not name an existing column.
+    """
+    target = _normalize(re.sub(r"^(the|their|its)\s+", "", phrase.strip(), flags=re.I))
+    if not target:
+        return None
+    normalized = {column: _normalize(column) for column in data.columns}
+    for column, name in normalized.items():
+        if name == target:
+            return column
+    for column, name in normalized.items():
+        if target in name:
+            return column
+    return None
+
+
+def _match_value(value, data: pd.DataFrame):
+    """
+    Finds the string column holding exactly the given value (ignoring case).
+    Substring matches are not accepted, so "AI" never matches "Daisy".
+    """
+    target = value.strip().casefold()
+    if not target:
+        return None
+    for column in data.columns:
+        series = data[column]
+        if not (
+            pd.api.types.is_string_dtype(series)
+            or isinstance(series.dtype, pd.CategoricalDtype)
+        ):
+            continue
+        if (series.astype(str).str.casefold() == target).any():
+            return column
+    return None
+
+
+def _is_filler(clause):
+    """Checks whether a clause consists only of words without a refinement."""
+    return all(word in FILLER_WORDS for word in re.findall(r"\w+", clause.lower()))
+
+
+def _plan_clause(clause, data: pd.DataFrame):
+    """
+    Turns one clause of a follow-up into refinement steps. Returns None when
+    the clause is not fully understood against the cached result.
+    """
+    match = LIMIT_PATTERN.match(clause)
+    if match:
+        tail = match.group("which").lower() in ("bottom", "last")
+        steps = [{"op": "limit", "count": int(match.group("count")), "tail": tail}]
+        if match.group("column"):
+            column = resolve_column(match.group("column"), data)
+            if column is None:
+                return None
+            # "top 5 by CGPA" keeps the highest values, "bottom 5" the lowest
+            steps = [
+                {"op": "sort", "column": column, "ascending": tail},
+                {"op": "limit", "count": steps[0]["count"], "tail": False},
+            ]
+        return steps
+
+    match = SORT_PATTERN.match(clause) or EXTREME_PATTERN.match(clause)
+    if match:
+        column = resolve_column(match.group("column"), data)
+        if column is None:
+            return None
+        direction = (match.group("direction") or "").lower()
+        descending = direction.startswith(("desc", "high", "larg"))
+        return [{"op": "sort", "column": column, "ascending": not descending}]
+
+    match = ONLY_PATTERN.match(clause)
+    if match:
+        value = match.group("value").strip()
+        if _is_filler(value):
+            return []
+        column = _match_value(value, data)
+        if column is None:
+            return None
+        return [{"op": "filter", "column": column, "value": value}]
+
+    match = COMPARE_PATTERN.match(clause)
+    if match:
+        column = resolve_column(match.group("column"), data)
+        if column is None or not pd.api.types.is_numeric_dtype(data[column]):
+            return None
+        return [
+            {
+                "op": "compare",
+                "column": column,
+                "operator": OPERATORS[match.group("op").lower()],
+                "value": float(match.group("value")),
+            }
+        ]
+
+    return [] if _is_filler(clause) else None
+
+
+def plan_followup(user_input, data: pd.DataFrame):
+    """
+    Builds a local refinement plan for a follow-up query against the previous result.
+
+    Returns a list of steps (dicts with an "op" key) when the whole follow-up can
+    be answered from the cached DataFrame, or None when new SQL is required
+    (for instance because the query mentions a column the result does not contain
+    or has a clause the planner does not understand).
+    """
+    if not isinstance(data, pd.DataFrame) or data.empty:
+        return None
+    text = user_input.strip().rstrip(".?!")
+    if not text or not FOLLOWUP_MARKERS.search(text):
+        return None
+
+    steps = []
+    for clause in CLAUSE_BOUNDARY.split(text):
+        clause = clause.strip()
+        if not clause:
+            continue
+        clause_steps = _plan_clause(clause, data)
+        if clause_steps is None:
+            return None
+        steps.extend(clause_steps)
+
+    # Row filters commute, so they run first; sorts and limits keep clause order
+    steps.sort(key=lambda step: step["op"] not in ("filter", "compare"))
+    return steps or None
+
+
+def apply_followup(data: pd.DataFrame, steps):
+    """Applies a refinement plan produced by plan_followup to the cached DataFrame."""
+    result = data
+    for step in steps:
+        if step["op"] == "filter":
+            values = result[step["column"]].astype(str).str.casefold()
+            result = result[values == step["value"].casefold()]
+        elif step["op"] == "compare":
+            column = result[step["column"]]
+            result = result[getattr(column, step["operator"])(step["value"])]
+        elif step["op"] == "sort":
+            result = result.sort_values(
+                step["column"], ascending=step["ascending"], kind="stable"
+            )
+        elif step["op"] == "limit":
+            if step["tail"]:
+                result = result.tail(step["count"])
+            else:
+                result = result.head(step["count"])
+    return result.reset_index(drop=True)
+
+
+def describe_followup(steps):
+    """Returns a short human-readable description of a refinement plan."""
+    parts = []
+    for step in steps:
+        if step["op"] == "filter":
+            parts.append(f"kept rows where {step['column']} is '{step['value']}'")
+        elif step["op"] == "compare":
+            symbols = {"gt": ">", "lt": "<", "ge": ">=", "le": "<=", "eq": "=", "ne": "!="}
+            parts.append(
+                f"kept rows where {step['column']} {symbols[step['operator']]} {step['value']:g}"
+            )
+        elif step["op"] == "sort":
+            order = "ascending" if step["ascending"] else "descending"
+            parts.append(f"sorted by {step['column']} ({order})")
+        elif step["op"] == "limit":
+            which = "last" if step["tail"] else "first"
+            parts.append(f"took the {which} {step['count']} rows")
+    return "Refined the previous result locally: " + ", ".join(parts) + "."
+
+
+def answer_followup(user_input, data: pd.DataFrame):
+    """
+    Tries to answer a follow-up from the previous result of the conversation.
+    Returns (data, description) on success or None when a new SQL query is needed.
+    """
+    steps = plan_followup(user_input, data)
+    if steps is None:
+        return None
+    try:
+        refined = apply_followup(data, steps)
+    except Exception as e:
+        print(f"Error applying follow-up locally: {e}")
+        return None
+    return refined, describe_followup(steps)
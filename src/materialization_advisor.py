@@ -0,0 +1,251 @@
+"""
+# Materialization Advisor Module
+
+This module records the fingerprint, frequency and cost of every executed SQL
+query, detects frequently repeated expensive aggregates (e.g. average CGPA per
+department or fee totals per semester), materializes them on a schedule into
+small summary tables through BigQueryManager's destination_table support, and
+rewrites matching generated SQL to read the summary table while it is fresh.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+import regex as re
+from dotenv import load_dotenv
+from big_query_manager import BigQueryManager
+from sql_utils import normalize_sql
+
+load_dotenv()
+
+# A query shape must be executed this many times before it is materialized
+MATERIALIZE_MIN_HITS = int(os.getenv("MATERIALIZE_MIN_HITS", "3"))
+# ...and must on average process at least this many bytes or run this many seconds
+# in BigQuery (job start to end, so client-side latency does not count)
+MATERIALIZE_MIN_BYTES = int(os.getenv("MATERIALIZE_MIN_BYTES", str(10 * 1024 * 1024)))
+MATERIALIZE_MIN_SECONDS = float(os.getenv("MATERIALIZE_MIN_SECONDS", "2"))
+# Summary tables older than this many seconds are never read
+MATERIALIZE_MAX_STALENESS = float(os.getenv("MATERIALIZE_MAX_STALENESS", "3600"))
+# How often the scheduler refreshes summary tables and materializes new candidates
+MATERIALIZE_REFRESH_INTERVAL = float(os.getenv("MATERIALIZE_REFRESH_INTERVAL", "900"))
+# Summary tables that stop being refreshed (e.g. after a restart) expire in BigQuery
+MATERIALIZE_TABLE_EXPIRATION = MATERIALIZE_MAX_STALENESS + MATERIALIZE_REFRESH_INTERVAL
+
+TABLE_PREFIX = "mv_"
+
+AGGREGATE_PATTERN = re.compile(
+    r"\b(avg|sum|count|min|max|approx_count_distinct)\s*\(", re.IGNORECASE
+)
+GROUP_BY_PATTERN = re.compile(r"\bgroup\s+by\b", re.IGNORECASE)
+# Summary tables do not preserve row order, so ordered or limited results are not eligible
+ORDERING_PATTERN = re.compile(r"\border\s+by\b|\blimit\b", re.IGNORECASE)
+WRITE_PATTERN = re.compile(
+    r"^\s*(insert|update|delete|merge|create|alter|drop|truncate)\b", re.IGNORECASE
+)
+
+
+def fingerprint_sql(sql):
+    """Returns a stable fingerprint for the shape of a SQL query."""
+    return hashlib.sha256(normalize_sql(sql).encode("utf-8")).hexdigest()[:16]
+
+
+def is_aggregate(sql):
+    """Checks whether a query is a read-only aggregate worth materializing."""
+    return (
+        not WRITE_PATTERN.search(sql)
+        and not ORDERING_PATTERN.search(sql)
+        and bool(AGGREGATE_PATTERN.search(sql))
+        and bool(GROUP_BY_PATTERN.search(sql))
+    )
+
+
+class MaterializationAdvisor:
+    """
+    Tracks executed queries and manages summary tables for hot aggregates.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # fingerprint -> {"sql", "hits", "bytes_processed", "elapsed"}
+        self._shapes = {}
+        # fingerprint -> {"table", "refreshed_at"}
+        self._materialized = {}
+        self._savings = {"rewrites": 0, "bytes_saved": 0, "seconds_saved": 0.0}
+        self._scheduler = None
+
+    def record(self, sql, stats, rewritten=False):
+        """
+        Records one execution of a query with the bytes processed and elapsed
+        seconds reported by BigQueryManager. For rewritten queries the savings
+        against the original query's average cost are accumulated instead.
+        """
+        if not stats:
+            return
+        fingerprint = fingerprint_sql(sql)
+        with self._lock:
+            shape = self._shapes.setdefault(
+                fingerprint,
+                {
+                    "sql": normalize_sql(sql),
+                    "hits": 0,
+                    "executions": 0,
+                    "bytes_processed": 0,
+                    "elapsed": 0.0,
+                },
+            )
+            shape["hits"] += 1
+            if not rewritten:
+                shape["executions"] += 1
+                shape["bytes_processed"] += stats["bytes_processed"]
+                shape["elapsed"] += stats["elapsed"]
+                return
+
+            average_bytes, average_seconds = self._average_cost(shape)
+            self._savings["rewrites"] += 1
+            self._savings["bytes_saved"] += max(
+                average_bytes - stats["bytes_processed"], 0
+            )
+            self._savings["seconds_saved"] += max(
+                average_seconds - stats["elapsed"], 0.0
+            )
+
+    def rewrite(self, sql, bq_manager):
+        """
+        Returns SQL reading the summary table when the query matches a fresh
+        materialized shape, otherwise None.
+        """
+        fingerprint = fingerprint_sql(sql)
+        with self._lock:
+            view = self._materialized.get(fingerprint)
+            if view is None:
+                return None
+            if time.time() - view["refreshed_at"] > MATERIALIZE_MAX_STALENESS:
+                return None
+        return (
+            f"SELECT * FROM `{bq_manager.project_id}.{bq_manager.dataset_id}"
+            f".{view['table']}`"
+        )
+
+    def invalidate(self, sql, bq_manager=None):
+        """
+        Forgets the summary table of a query shape, e.g. after reading it failed,
+        and deletes the table when a BigQueryManager is given.
+        """
+        with self._lock:
+            view = self._materialized.pop(fingerprint_sql(sql), None)
+        if view is None or bq_manager is None:
+            return
+        try:
+            bq_manager.delete_table(view["table"])
+        except Exception as e:
+            print(f"Error deleting {view['table']}: {e}")
+
+    def candidates(self):
+        """Returns fingerprints of hot, expensive aggregates not yet materialized."""
+        with self._lock:
+            hot = []
+            for fingerprint, shape in self._shapes.items():
+                if fingerprint in self._materialized or not is_aggregate(shape["sql"]):
+                    continue
+                if shape["hits"] < MATERIALIZE_MIN_HITS or not shape["executions"]:
+                    continue
+                average_bytes, average_seconds = self._average_cost(shape)
+                if (
+                    average_bytes >= MATERIALIZE_MIN_BYTES
+                    or average_seconds >= MATERIALIZE_MIN_SECONDS
+                ):
+                    hot.append(fingerprint)
+            return hot
+
+    def refresh(self, bq_manager):
+        """
+        Materializes new candidates and refreshes summary tables that are due.
+        Returns the number of tables written.
+        """
+        now = time.time()
+        with self._lock:
+            due = [
+                fingerprint
+                for fingerprint, view in self._materialized.items()
+                if now - view["refreshed_at"] >= MATERIALIZE_REFRESH_INTERVAL
+            ]
+        written = 0
+        for fingerprint in self.candidates() + due:
+            with self._lock:
+                sql = self._shapes[fingerprint]["sql"]
+            table = f"{TABLE_PREFIX}{fingerprint}"
+            try:
+                bq_manager.execute_query(
+                    sql,
+                    destination_table=table,
+                    expiration_seconds=MATERIALIZE_TABLE_EXPIRATION,
+                )
+            except Exception as e:
+                print(f"Error materializing {table}: {e}")
+                continue
+            with self._lock:
+                self._materialized[fingerprint] = {
+                    "table": table,
+                    "refreshed_at": time.time(),
+                }
+            written += 1
+        return written
+
+    def start(self, bq_manager, interval=MATERIALIZE_REFRESH_INTERVAL):
+        """
+        Starts the background refresh schedule once per process. The scheduler
+        uses its own BigQueryManager so it never clobbers a session's query stats.
+        """
+        with self._lock:
+            if self._scheduler is not None:
+                return
+            bq_manager = BigQueryManager(
+                project_id=bq_manager.project_id, dataset_id=bq_manager.dataset_id
+            )
+
+            def run():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.refresh(bq_manager)
+                    except Exception as e:
+                        print(f"Error refreshing materialized tables: {e}")
+
+            self._scheduler = threading.Thread(
+                target=run, name="materialization-advisor", daemon=True
+            )
+            self._scheduler.start()
+
+    def report(self):
+        """
+        Returns the materialized tables with their age and the accumulated
+        bytes and latency saved by reading them instead of the base tables.
+        """
+        now = time.time()
+        with self._lock:
+            tables = [
+                {
+                    "table": view["table"],
+                    "sql": self._shapes[fingerprint]["sql"],
+                    "hits": self._shapes[fingerprint]["hits"],
+                    "age_seconds": now - view["refreshed_at"],
+                    "fresh": now - view["refreshed_at"] <= MATERIALIZE_MAX_STALENESS,
+                }
+                for fingerprint, view in self._materialized.items()
+            ]
+            return {"tables": tables, **self._savings}
+
+    @staticmethod
+    def _average_cost(shape):
+        """Returns the average bytes processed and seconds of a query shape."""
+        executions = max(shape["executions"], 1)
+        return (
+            shape["bytes_processed"] / executions,
+            shape["elapsed"] / executions,
+        )
+
+
+# Shared by every Streamlit session served by this process
+materialization_advisor = MaterializationAdvisor()
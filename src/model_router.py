@@ -0,0 +1,206 @@
+"""
+# Model Routing Module
+
+This module routes each LLM stage (SQL generation, fallback refinement and data
+summaries) to a configurable model tier, starting with a fast flash-class model
+and escalating to the large model only when the cheaper output fails offline
+validation. Per-stage, per-tier latency and success rates are recorded so the
+default tiers can be tuned.
+"""
+
+import os
+import threading
+import time
+
+import regex as re
+from dotenv import load_dotenv
+from sql_utils import COMMENT_PATTERN, LITERAL_PATTERN, refine_response
+
+load_dotenv()
+
+FALLBACK_PHRASE = (
+    "I cannot generate a SQL query for this request based on the provided schema."
+)
+
+# Tiers ordered from cheapest to most capable; escalation walks this list
+TIERS = ["fast", "large"]
+
+DEFAULT_STAGE_TIERS = {
+    "sql": os.getenv("MODEL_TIER_SQL", "fast"),
+    "fallback": os.getenv("MODEL_TIER_FALLBACK", "fast"),
+    "summary": os.getenv("MODEL_TIER_SUMMARY", "fast"),
+}
+
+SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "schema.txt")
+
+# Backticked or fully qualified project.dataset.Table references; other names after
+# FROM can be EXTRACT(... FROM alias.column) arguments, so they are not checked
+TABLE_REFERENCE_PATTERN = re.compile(
+    r"\b(?:from|join)\s+(?:`([\w\-.]+)`|([\w\-]+\.[\w\-]+\.[\w\-]+))",
+    re.IGNORECASE,
+)
+CTE_NAME_PATTERN = re.compile(r"(?:\bwith|,)\s*(\w+)\s+as\s*\(", re.IGNORECASE)
+# Scans literals and comments left to right so quotes inside either are ignored
+LITERAL_OR_COMMENT_PATTERN = re.compile(
+    f"{LITERAL_PATTERN.pattern}|{COMMENT_PATTERN.pattern}", re.DOTALL
+)
+
+
+def load_schema_catalog(file_path=SCHEMA_FILE):
+    """Reads the table names declared in the schema file."""
+    try:
+        with open(file_path, "r") as f:
+            return set(re.findall(r"Table Name:\s*(\w+)", f.read()))
+    except OSError as e:
+        print(f"Error loading schema catalog: {e}")
+        return set()
+
+
+def validate_sql(content, catalog=None):
+    """
+    Checks generated SQL without running it: it must be non-empty, must not be
+    the fallback phrase, must look like a parsable SELECT statement and, when a
+    catalog is given, may only reference tables declared in the schema.
+    """
+    # Strip backticks and code fences exactly as the app does before executing
+    sql = refine_response(content.strip())
+    sql = re.sub(r"^sql\s*", "", sql, flags=re.IGNORECASE).strip()
+    if not sql or FALLBACK_PHRASE in sql:
+        return False
+    if not re.match(r"^(select|with)\b", sql, re.IGNORECASE):
+        return False
+    # Unterminated quotes or unbalanced parentheses outside literals and comments
+    code = LITERAL_OR_COMMENT_PATTERN.sub(" ", sql)
+    if code.count("(") != code.count(")") or re.search(r"['\"`]", code):
+        return False
+    if catalog:
+        ctes = set(CTE_NAME_PATTERN.findall(sql))
+        for quoted, qualified in TABLE_REFERENCE_PATTERN.findall(sql):
+            table = (quoted or qualified).split(".")[-1]
+            if table not in catalog and table not in ctes:
+                return False
+    return True
+
+
+def validate_text(content):
+    """Checks that a free-text response is non-empty."""
+    return bool(content.strip())
+
+
+class StageModel:
+    """
+    An LLM-compatible handle bound to one stage of a ModelRouter, so existing
+    code calling llm.invoke(...) is routed without changes.
+    """
+
+    def __init__(self, router, stage):
+        self.router = router
+        self.stage = stage
+
+    def invoke(self, messages):
+        """Invokes the router for this stage."""
+        return self.router.invoke(self.stage, messages)
+
+
+class ModelStats:
+    """
+    Per-stage, per-tier call counts, success rates and latency of model calls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (stage, tier) -> {"calls", "successes", "latency"}
+        self._stats = {}
+
+    def record(self, stage, tier, success, latency):
+        """Accumulates the outcome of one model call."""
+        with self._lock:
+            entry = self._stats.setdefault(
+                (stage, tier), {"calls": 0, "successes": 0, "latency": 0.0}
+            )
+            entry["calls"] += 1
+            entry["successes"] += int(success)
+            entry["latency"] += latency
+
+    def summary(self):
+        """
+        Returns per-stage, per-tier call counts, success rates and average latency.
+        """
+        with self._lock:
+            return {
+                f"{stage}/{tier}": {
+                    "calls": entry["calls"],
+                    "success_rate": entry["successes"] / entry["calls"],
+                    "average_latency": entry["latency"] / entry["calls"],
+                }
+                for (stage, tier), entry in self._stats.items()
+            }
+
+
+class ModelRouter:
+    """
+    Sends each stage to its default tier and escalates on failed validation.
+    """
+
+    def __init__(
+        self, models, stage_tiers=None, validators=None, catalog=None, stats=None
+    ):
+        # tier name -> chat model exposing invoke(messages)
+        self.models = models
+        self.stage_tiers = {**DEFAULT_STAGE_TIERS, **(stage_tiers or {})}
+        for stage, tier in self.stage_tiers.items():
+            if tier not in TIERS:
+                raise ValueError(
+                    f"Unknown model tier '{tier}' for stage '{stage}'. "
+                    f"Expected one of: {', '.join(TIERS)}."
+                )
+        self.validators = {
+            "sql": lambda content: validate_sql(content, catalog),
+            "fallback": validate_text,
+            "summary": validate_text,
+            **(validators or {}),
+        }
+        # Shared across sessions by default so admins see process-wide numbers
+        self.model_stats = stats or model_stats
+
+    def for_stage(self, stage):
+        """Returns an LLM-compatible handle for a stage."""
+        return StageModel(self, stage)
+
+    def invoke(self, stage, messages):
+        """
+        Invokes the stage's default tier, escalating through the larger tiers
+        while the response fails validation or the model raises. The last tier's
+        response is returned even if it fails validation.
+        """
+        start_tier = self.stage_tiers.get(stage, TIERS[0])
+        tiers = [tier for tier in TIERS[TIERS.index(start_tier):] if tier in self.models]
+        validator = self.validators.get(stage, validate_text)
+
+        for index, tier in enumerate(tiers):
+            last = index == len(tiers) - 1
+            start = time.perf_counter()
+            try:
+                response = self.models[tier].invoke(messages)
+                success = validator(response.content)
+            except Exception as e:
+                self.model_stats.record(stage, tier, False, time.perf_counter() - start)
+                if last:
+                    raise
+                print(f"Model tier '{tier}' failed for stage '{stage}': {e}")
+                continue
+            self.model_stats.record(stage, tier, success, time.perf_counter() - start)
+            if success or last:
+                return response
+            print(f"Escalating stage '{stage}' from tier '{tier}'.")
+        raise ValueError(f"No model configured for stage '{stage}'.")
+
+    def stats(self):
+        """
+        Returns per-stage, per-tier call counts, success rates and average latency.
+        """
+        return self.model_stats.summary()
+
+
+# Shared by every Streamlit session served by this process
+model_stats = ModelStats()
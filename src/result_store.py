@@ -0,0 +1,233 @@
+"""
+# Result Storage Module
+
+This module keeps query results retained across conversation turns compact and
+accounted for. DataFrames are converted to compact dtypes (categorical or
+Arrow-backed strings, downcast numerics) and registered with a process-wide
+ResultStore that tracks the memory held by every session and spills the least
+recently used results to disk as memory-mapped Arrow files once a global cap
+is exceeded.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid4
+
+import pandas as pd
+import pyarrow as pa
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Global cap on resident result memory, in megabytes
+RESULT_MEMORY_CAP_MB = float(os.getenv("RESULT_MEMORY_CAP_MB", "512"))
+# Sessions idle for longer than this many seconds are dropped entirely
+RESULT_IDLE_TIMEOUT = float(os.getenv("RESULT_IDLE_TIMEOUT", "3600"))
+# String columns with a lower unique-value ratio are stored as categoricals
+CATEGORY_RATIO = 0.5
+
+
+def compact_dataframe(data: pd.DataFrame):
+    """
+    Converts a DataFrame to compact dtypes: low-cardinality strings become
+    categoricals (dictionary encoded), other strings become Arrow-backed strings,
+    integer columns are downcast to the smallest type that fits and float columns
+    only when every value round-trips exactly. Narrow integers overflow under
+    arithmetic, so only copies that are retained, not computed on, are compacted.
+    """
+    if not isinstance(data, pd.DataFrame) or data.empty:
+        return data
+
+    compact = {}
+    for column in data.columns:
+        series = data[column]
+        if pd.api.types.is_bool_dtype(series):
+            compact[column] = series
+        elif pd.api.types.is_integer_dtype(series):
+            compact[column] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            # Only downcast when no value changes, e.g. 3.44 does not survive float32
+            downcast = pd.to_numeric(series, downcast="float")
+            exact = downcast.astype(series.dtype).equals(series)
+            compact[column] = downcast if exact else series
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            compact[column] = series
+        elif pd.api.types.is_string_dtype(series):
+            if series.nunique(dropna=True) <= CATEGORY_RATIO * len(series):
+                compact[column] = series.astype("category")
+            else:
+                compact[column] = series.astype("string[pyarrow]")
+        else:
+            compact[column] = series
+    return pd.DataFrame(compact, index=data.index)
+
+
+def dataframe_size(data: pd.DataFrame):
+    """Returns the number of bytes held by a DataFrame, including string payloads."""
+    return int(data.memory_usage(deep=True, index=True).sum())
+
+
+class ResultStore:
+    """
+    A process-wide store for results retained by Streamlit sessions.
+    """
+
+    def __init__(self, memory_cap_bytes, spill_dir=None):
+        self.memory_cap_bytes = int(memory_cap_bytes)
+        self.spill_dir = spill_dir or tempfile.mkdtemp(prefix="llm_bq_results_")
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        # result_id -> entry, ordered from least to most recently used
+        self._entries = OrderedDict()
+        self._resident_bytes = 0
+
+    def put(self, session_id, data: pd.DataFrame):
+        """
+        Stores a result for a session and returns its result ID.
+        """
+        data = compact_dataframe(data)
+        result_id = str(uuid4())
+        with self._lock:
+            self._expire_idle()
+            self._entries[result_id] = {
+                "session_id": session_id,
+                "data": data,
+                "path": None,
+                "bytes": dataframe_size(data),
+                "last_used": time.time(),
+            }
+            self._resident_bytes += self._entries[result_id]["bytes"]
+            self._enforce_cap()
+        return result_id
+
+    def get(self, result_id):
+        """
+        Returns a stored result, loading it from its memory-mapped spill file if
+        it was evicted. Returns None for unknown or expired result IDs.
+        """
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(result_id)
+            entry["last_used"] = time.time()
+            if entry["data"] is not None:
+                return entry["data"]
+
+            with pa.memory_map(entry["path"], "r") as source:
+                table = pa.ipc.open_file(source).read_all()
+            # Arrow-backed strings come back as Python strings, so compact them again
+            entry["data"] = compact_dataframe(table.to_pandas())
+            entry["bytes"] = dataframe_size(entry["data"])
+            self._resident_bytes += entry["bytes"]
+            self._enforce_cap(keep=result_id)
+            return entry["data"]
+
+    def release(self, result_id):
+        """Drops a single result from memory and disk."""
+        with self._lock:
+            self._drop(result_id)
+
+    def release_session(self, session_id):
+        """Drops every result held by a session."""
+        with self._lock:
+            for result_id in [
+                key
+                for key, entry in self._entries.items()
+                if entry["session_id"] == session_id
+            ]:
+                self._drop(result_id)
+
+    def set_cap(self, memory_cap_bytes):
+        """Changes the global memory cap and spills results until it is respected."""
+        with self._lock:
+            self.memory_cap_bytes = int(memory_cap_bytes)
+            self._enforce_cap()
+
+    def stats(self):
+        """
+        Returns memory accounting for the whole process: resident and spilled
+        bytes in total and per session, plus the configured cap.
+        """
+        with self._lock:
+            sessions = {}
+            spilled_bytes = 0
+            for entry in self._entries.values():
+                usage = sessions.setdefault(
+                    entry["session_id"],
+                    {"results": 0, "resident_bytes": 0, "spilled_bytes": 0},
+                )
+                usage["results"] += 1
+                if entry["data"] is not None:
+                    usage["resident_bytes"] += entry["bytes"]
+                else:
+                    usage["spilled_bytes"] += entry["bytes"]
+                    spilled_bytes += entry["bytes"]
+            return {
+                "memory_cap_bytes": self.memory_cap_bytes,
+                "resident_bytes": self._resident_bytes,
+                "spilled_bytes": spilled_bytes,
+                "sessions": sessions,
+            }
+
+    def clear(self):
+        """Drops every stored result and removes the spill directory contents."""
+        with self._lock:
+            self._entries.clear()
+            self._resident_bytes = 0
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            os.makedirs(self.spill_dir, exist_ok=True)
+
+    def _enforce_cap(self, keep=None):
+        """Spills least recently used resident results until under the cap."""
+        for result_id, entry in list(self._entries.items()):
+            if self._resident_bytes <= self.memory_cap_bytes:
+                break
+            if result_id != keep and entry["data"] is not None:
+                self._spill(result_id, entry)
+
+    def _spill(self, result_id, entry):
+        """Writes a resident result to an Arrow IPC file and frees its memory."""
+        if entry["path"] is None:
+            path = os.path.join(self.spill_dir, f"{result_id}.arrow")
+            table = pa.Table.from_pandas(entry["data"], preserve_index=False)
+            with pa.OSFile(path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            entry["path"] = path
+        self._resident_bytes -= entry["bytes"]
+        entry["data"] = None
+
+    def _drop(self, result_id):
+        """Removes a result from the store, deleting its spill file if any."""
+        entry = self._entries.pop(result_id, None)
+        if entry is None:
+            return
+        if entry["data"] is not None:
+            self._resident_bytes -= entry["bytes"]
+        if entry["path"] and os.path.exists(entry["path"]):
+            os.remove(entry["path"])
+
+    def _expire_idle(self):
+        """Drops results belonging to sessions that have been idle too long."""
+        cutoff = time.time() - RESULT_IDLE_TIMEOUT
+        last_used = {}
+        for entry in self._entries.values():
+            session_id = entry["session_id"]
+            last_used[session_id] = max(
+                last_used.get(session_id, 0), entry["last_used"]
+            )
+        for result_id in [
+            key
+            for key, entry in self._entries.items()
+            if last_used[entry["session_id"]] < cutoff
+        ]:
+            self._drop(result_id)
+
+
+# Shared by every Streamlit session served by this process
+result_store = ResultStore(memory_cap_bytes=RESULT_MEMORY_CAP_MB * 1024 * 1024)
@@ -0,0 +1,205 @@
+"""
+# Speculative Execution Module
+
+This module overlaps BigQuery work with SQL generation. While the LLM is still
+generating, the cached SQL of the most semantically similar past question is
+started as a cancellable BigQuery job, provided its dry-run bytes estimate is
+under a cost cap. If the generated SQL matches, the speculative job's result is
+used; otherwise the job is cancelled right away. Hit rate and latency saved are
+reported for tuning.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from materialization_advisor import AGGREGATE_PATTERN, ORDERING_PATTERN
+from sql_utils import normalize_sql
+
+load_dotenv()
+
+# Enables speculative jobs and preview queries by default in the sidebar toggle
+SPECULATIVE_MODE = os.getenv("SPECULATIVE_MODE", "false").lower() == "true"
+# Speculative and preview jobs may not process more than this many bytes
+SPECULATIVE_MAX_BYTES = int(os.getenv("SPECULATIVE_MAX_BYTES", str(100 * 1024 * 1024)))
+# Cosine similarity a past question needs before its SQL is run speculatively
+SPECULATIVE_MIN_SIMILARITY = float(os.getenv("SPECULATIVE_MIN_SIMILARITY", "0.9"))
+# Number of past questions kept for speculation
+SPECULATIVE_CACHE_SIZE = 200
+# Queries estimated to process less than this finish quickly, so no preview is run
+PREVIEW_MIN_BYTES = int(os.getenv("PREVIEW_MIN_BYTES", str(10 * 1024 * 1024)))
+
+
+def cosine_similarity(left, right):
+    """Returns the cosine similarity of two embedding vectors."""
+    dot = sum(a * b for a, b in zip(left, right))
+    norm = math.sqrt(sum(a * a for a in left)) * math.sqrt(sum(b * b for b in right))
+    return dot / norm if norm else 0.0
+
+
+class SpeculativeExecutor:
+    """
+    Caches question embeddings with their SQL and runs speculative BigQuery jobs.
+    """
+
+    def __init__(
+        self,
+        max_bytes=SPECULATIVE_MAX_BYTES,
+        min_similarity=SPECULATIVE_MIN_SIMILARITY,
+    ):
+        self.max_bytes = max_bytes
+        self.min_similarity = min_similarity
+        self._lock = threading.Lock()
+        # Embeds questions and starts speculative jobs while the model generates
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="speculation")
+        # (question embedding, SQL) pairs, oldest first
+        self._cache = deque(maxlen=SPECULATIVE_CACHE_SIZE)
+        self._stats = {
+            "speculations": 0,
+            "hits": 0,
+            "misses": 0,
+            "skipped_over_cap": 0,
+            "seconds_saved": 0.0,
+            "previews": 0,
+        }
+
+    def speculate_async(self, question, embeddings, bq_manager):
+        """Runs speculate in the background and returns its future."""
+        return self._pool.submit(self.speculate, question, embeddings, bq_manager)
+
+    def speculate(self, question, embeddings, bq_manager):
+        """
+        Embeds the question and, when a similar past question exists, starts its
+        SQL as a speculative job. Returns a speculation dict (with or without a
+        job) that is later passed to resolve and remember.
+        """
+        speculation = {
+            "embedding": None,
+            "sql": None,
+            "job": None,
+            "started_at": None,
+            "stats": None,
+        }
+        try:
+            speculation["embedding"] = embeddings.embed_query(question)
+        except Exception as e:
+            print(f"Error embedding question for speculation: {e}")
+            return speculation
+
+        with self._lock:
+            scored = [
+                (cosine_similarity(speculation["embedding"], embedding), sql)
+                for embedding, sql in self._cache
+            ]
+        if not scored:
+            return speculation
+        similarity, sql = max(scored, key=lambda item: item[0])
+        if similarity < self.min_similarity:
+            return speculation
+
+        try:
+            if bq_manager.dry_run(sql) > self.max_bytes:
+                with self._lock:
+                    self._stats["skipped_over_cap"] += 1
+                return speculation
+            speculation["started_at"] = time.perf_counter()
+            speculation["job"] = bq_manager.start_query(sql, self.max_bytes)
+            speculation["sql"] = sql
+        except Exception as e:
+            print(f"Error starting speculative query: {e}")
+            return speculation
+
+        with self._lock:
+            self._stats["speculations"] += 1
+        return speculation
+
+    def resolve(self, speculation, sql):
+        """
+        Returns the speculative job's DataFrame when it ran the same SQL as the
+        generated query, otherwise cancels the job and returns None. On a hit the
+        job's bytes processed and duration are stored in speculation["stats"].
+        """
+        if not speculation or speculation["job"] is None:
+            return None
+        job = speculation["job"]
+        if normalize_sql(speculation["sql"]) != normalize_sql(sql):
+            self.cancel(speculation)
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        resolved_at = time.perf_counter()
+        try:
+            data = job.result().to_dataframe()
+        except Exception as e:
+            print(f"Error reading speculative query result: {e}")
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        # The job ran while the model was generating; that overlap is saved latency
+        if job.started and job.ended:
+            duration = (job.ended - job.started).total_seconds()
+        else:
+            duration = time.perf_counter() - speculation["started_at"]
+        saved = min(duration, resolved_at - speculation["started_at"])
+        speculation["stats"] = {
+            "bytes_processed": job.total_bytes_processed or 0,
+            "elapsed": duration,
+        }
+        with self._lock:
+            self._stats["hits"] += 1
+            self._stats["seconds_saved"] += max(saved, 0.0)
+        return data
+
+    def cancel(self, speculation):
+        """Cancels a speculative job that lost to the generated SQL."""
+        if speculation and speculation["job"] is not None:
+            try:
+                speculation["job"].cancel()
+            except Exception as e:
+                print(f"Error cancelling speculative query: {e}")
+            speculation["job"] = None
+
+    def should_preview(self, sql, bq_manager):
+        """
+        Decides whether a LIMITed preview is worth its cost. The preview scans as
+        much as the full query, so it is skipped for aggregates (which return few
+        rows anyway), for queries too small to need one and above the cost cap.
+        Ordered queries are skipped too, since wrapping them in a subquery drops
+        their ORDER BY and the preview would show arbitrary rows.
+        """
+        if AGGREGATE_PATTERN.search(sql) or ORDERING_PATTERN.search(sql):
+            return False
+        try:
+            estimate = bq_manager.dry_run(sql)
+        except Exception as e:
+            print(f"Error estimating preview cost: {e}")
+            return False
+        return PREVIEW_MIN_BYTES <= estimate <= self.max_bytes
+
+    def record_preview(self):
+        """Counts a preview that finished before the full query and was shown."""
+        with self._lock:
+            self._stats["previews"] += 1
+
+    def remember(self, speculation, sql):
+        """Caches the SQL that answered a question for future speculation."""
+        if speculation and speculation["embedding"] is not None:
+            with self._lock:
+                self._cache.append((speculation["embedding"], sql))
+
+    def stats(self):
+        """Returns speculation counts, hit rate and total latency saved."""
+        with self._lock:
+            stats = dict(self._stats)
+        resolved = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / resolved if resolved else 0.0
+        return stats
+
+
+# Shared by every Streamlit session served by this process
+speculative_executor = SpeculativeExecutor()
@@ -0,0 +1,47 @@
+"""
+# SQL Text Utilities
+
+This module holds the dependency-free helpers for cleaning up and normalizing
+SQL text, shared by the data handler, the model router and the materialization
+advisor without pulling in the BigQuery and plotting clients.
+"""
+
+import regex as re
+
+LITERAL_PATTERN = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)")
+COMMENT_PATTERN = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+
+def refine_response(response):
+    """
+    Cleans and refines SQL query responses by removing markdown artifacts such
+    as code block backticks and unnecessary tags.
+    """
+
+    # Remove the 'sql' tag if it exists at the start of the response
+    response = re.sub(r"^sql\s*", "", response)
+
+    # Remove triple backticks or single backticks at both ends
+    response = re.sub(r"^```(.*)```$", r"\1", response, flags=re.DOTALL)
+    response = re.sub(r"^`(.*)`$", r"\1", response, flags=re.DOTALL)
+
+    # Strip any leading or trailing whitespace
+    return response.strip()
+
+
+def normalize_sql(sql):
+    """
+    Normalizes a SQL query so trivially different spellings share a shape:
+    comments and trailing semicolons are removed and whitespace outside of
+    quoted literals and identifiers is collapsed. Case is preserved because
+    BigQuery table names and string literals are case-sensitive.
+    """
+    parts = LITERAL_PATTERN.split(sql.strip())
+    normalized = []
+    for index, part in enumerate(parts):
+        if index % 2:
+            normalized.append(part)
+        else:
+            part = COMMENT_PATTERN.sub(" ", part)
+            normalized.append(re.sub(r"\s+", " ", part))
+    return "".join(normalized).strip().rstrip(";").strip()
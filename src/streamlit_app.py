@@ -10,13 +10,111 @@ Overview:
 - The retrieved data is processed and visualized with interactive charts.
 """
 
+import os
 import asyncio
+from uuid import uuid4
 import streamlit as st
 import pandas as pd
 from langchain_core.messages import HumanMessage
 from components import initialize_components
 from response_handler import generate_initial_response, trigger_fallback_logic
-from data_handler import refine_response, get_data, data_handler
+from data_handler import get_data, data_handler
+from followup_handler import answer_followup
+from result_store import result_store
+from materialization_advisor import materialization_advisor
+from speculative_executor import speculative_executor, SPECULATIVE_MODE
+from sql_utils import refine_response
+
+# Shows the result memory panel in the sidebar when enabled
+ADMIN_MODE = os.getenv("ADMIN_MODE", "false").lower() == "true"
+
+# Number of conversation turns retained per session for follow-up queries
+MAX_HISTORY_TURNS = 10
+
+
+def remember_turn(query, sql=None, data=None, summary=None):
+    """
+    Appends a conversation turn to the session history, dropping the oldest ones.
+    Result DataFrames are kept in the process-wide result store, not in the session.
+    A result that cannot be retained only disables local follow-ups on it.
+    """
+    result_id = None
+    if isinstance(data, pd.DataFrame):
+        try:
+            result_id = result_store.put(st.session_state.session_id, data)
+        except Exception as e:
+            print(f"Error retaining query result: {e}")
+    st.session_state.history.append(
+        {"query": query, "sql": sql, "result_id": result_id, "summary": summary}
+    )
+    for turn in st.session_state.history[:-MAX_HISTORY_TURNS]:
+        if turn["result_id"]:
+            result_store.release(turn["result_id"])
+    del st.session_state.history[:-MAX_HISTORY_TURNS]
+
+
+def previous_result():
+    """Returns the most recent result DataFrame of the conversation, if any."""
+    for turn in reversed(st.session_state.history):
+        if turn["result_id"]:
+            return result_store.get(turn["result_id"])
+    return None
+
+
+def show_memory_admin():
+    """Shows process-wide result memory usage and lets admins change the global cap."""
+    stats = result_store.stats()
+    megabyte = 1024 * 1024
+    st.header("Result Memory")
+    st.metric("Resident", f"{stats['resident_bytes'] / megabyte:.1f} MB")
+    st.metric("Spilled to disk", f"{stats['spilled_bytes'] / megabyte:.1f} MB")
+    st.write(f"Active sessions: {len(stats['sessions'])}")
+    cap_mb = st.number_input(
+        "Memory cap (MB)",
+        min_value=1.0,
+        value=stats["memory_cap_bytes"] / megabyte,
+        step=64.0,
+    )
+    if cap_mb * megabyte != stats["memory_cap_bytes"]:
+        result_store.set_cap(cap_mb * megabyte)
+
+
+def show_materialization_admin(bq_manager):
+    """Shows materialized summary tables and the bytes and latency they saved."""
+    report = materialization_advisor.report()
+    st.header("Materialized Aggregates")
+    st.metric("Rewritten queries", report["rewrites"])
+    st.metric("Bytes saved", f"{report['bytes_saved'] / (1024 * 1024):.1f} MB")
+    st.metric("Latency saved", f"{report['seconds_saved']:.1f} s")
+    if report["tables"]:
+        st.dataframe(pd.DataFrame(report["tables"]))
+    if st.button("Refresh summary tables now"):
+        written = materialization_advisor.refresh(bq_manager)
+        st.write(f"Materialized {written} summary table(s).")
+
+
+def show_model_admin(llm):
+    """Shows per-stage, per-tier model latency and success rates."""
+    st.header("Model Tiers")
+    stats = llm.stats()
+    if stats:
+        st.dataframe(pd.DataFrame(stats).T)
+    else:
+        st.write("No model calls yet.")
+
+
+def show_speculation_admin():
+    """Shows speculative execution hit rate and latency saved."""
+    stats = speculative_executor.stats()
+    st.header("Speculative Execution")
+    st.metric("Hit rate", f"{stats['hit_rate']:.0%}")
+    st.metric("Latency saved", f"{stats['seconds_saved']:.1f} s")
+    st.write(
+        f"Speculations: {stats['speculations']}, hits: {stats['hits']}, "
+        f"misses: {stats['misses']}, skipped over cost cap: {stats['skipped_over_cap']}, "
+        f"previews: {stats['previews']}"
+    )
+
 
 async def main():
     """This is the main function for the streamlit app."""
@@ -69,6 +167,28 @@ async def main():
         st.error(f"Failed to initialize components. Error: {e}")
         return
 
+    # Pre-compute hot aggregate queries into summary tables in the background
+    materialization_advisor.start(bq_manager)
+
+    if "history" not in st.session_state:
+        st.session_state.history = []
+        st.session_state.session_id = str(uuid4())
+
+    speculative = st.sidebar.checkbox(
+        "Speculative mode",
+        value=SPECULATIVE_MODE,
+        help="Run the SQL of a similar past question while the model generates, "
+        "and show a preview of the first rows before the full result is ready.",
+    )
+
+    # Previous turns of the conversation
+    if st.session_state.history:
+        with st.expander("Conversation history", expanded=False):
+            for turn in st.session_state.history:
+                st.markdown(f"**You:** {turn['query']}")
+                if turn["summary"]:
+                    st.write(turn["summary"])
+
     # User input
     user_query = st.text_area(
         "Enter your query:",
@@ -82,22 +202,53 @@ async def main():
             # Create placeholder for results
             with st.container():
                 with st.spinner("Processing your query... Please wait."):
+                    speculation = None
                     try:
+                        # Step 0: Answer follow-ups locally from the previous result
+                        followup = None
+                        previous_data = previous_result()
+                        if previous_data is not None:
+                            followup = answer_followup(user_query, previous_data)
+
                         # Step 1: Get initial response from LLM
-                        initial_response = generate_initial_response(
-                            user_query, llm, vector_store, k=5
-                        )
-                        # st.write("Initial Response from LLM:")
-                        # st.write(initial_response)
+                        if followup is None:
+                            # Speculatively run cached SQL of a similar past question
+                            speculation_future = None
+                            if speculative:
+                                speculation_future = speculative_executor.speculate_async(
+                                    user_query,
+                                    vector_store.embeddings,
+                                    bq_manager,
+                                )
+                            initial_response = generate_initial_response(
+                                user_query, llm.for_stage("sql"), vector_store, k=5
+                            )
+                            if speculation_future is not None:
+                                speculation = speculation_future.result()
+                            # st.write("Initial Response from LLM:")
+                            # st.write(initial_response)
+
+                        if followup is not None:
+                            data, description = followup
+                            with st.expander(
+                                "Click wot view the Data Summary", expanded=True
+                            ):
+                                st.write(description)
+                                st.dataframe(data)
+                            remember_turn(user_query, data=data, summary=description)
 
                         # Step 2: Check if initial response indicates fallback is needed
-                        if (
+                        elif (
                             "I cannot generate a SQL query for this request based on the provided schema."
                             in initial_response
                         ):
+                            speculative_executor.cancel(speculation)
                             st.write("Fallback response generated.")
                             fallback_response = trigger_fallback_logic(
-                                user_query, llm, "", HumanMessage(content=user_query)
+                                user_query,
+                                llm.for_stage("fallback"),
+                                "",
+                                HumanMessage(content=user_query),
                             )
                             st.write("Fallback Response:")
                             st.write(fallback_response)
@@ -107,16 +258,38 @@ async def main():
                             # st.write("Refined Response:")
                             # st.write(refined_response)
 
-                            # Step 4: Get data from BigQuery
-                            data = get_data(bq_manager, refined_response)
+                            # Step 4: Get data from BigQuery, previewing the first rows
+                            preview_placeholder = st.empty()
+
+                            def show_preview(preview):
+                                with preview_placeholder.container():
+                                    st.caption(
+                                        f"Draft: showing the first {len(preview)} rows "
+                                        "while the full query finishes."
+                                    )
+                                    st.dataframe(preview)
+
+                            data = get_data(
+                                bq_manager,
+                                refined_response,
+                                speculation,
+                                show_preview if speculative else None,
+                            )
                             # st.write("Data retrieved from BigQuery:")
                             # st.write(data)
 
                             # Step 5: Handle and summarize the data
                             if isinstance(data, pd.DataFrame) and not data.empty:
                                 summary_text, chart = data_handler(
-                                    data, user_query, llm
+                                    data, user_query, llm.for_stage("summary")
                                 )
+                                remember_turn(
+                                    user_query, refined_response, data, summary_text
+                                )
+                                speculative_executor.remember(
+                                    speculation, refined_response
+                                )
+                                preview_placeholder.empty()
                                 # st.write("Data Summary:")
                                 # st.write(summary_text)
                                 with st.expander(
@@ -143,8 +316,10 @@ async def main():
                                         )
                                         st.markdown("</div>", unsafe_allow_html=True)
                             else:
+                                preview_placeholder.empty()
                                 st.write("No relevant data found.")
                     except Exception as e:
+                        speculative_executor.cancel(speculation)
                         st.error(f"An error occurred: {e}")
         else:
             st.write("Please enter a query.")
@@ -168,9 +343,22 @@ async def main():
         - Include relevant time periods or conditions.
         - Mention specific table names if you know them.
         - Use clear and concise language.
+        - Refine the last answer with follow-ups such as "now sort that by CGPA"
+          or "only the Computer Science ones"; these are answered instantly.
         """
         )
 
+        if st.button("Clear conversation"):
+            result_store.release_session(st.session_state.session_id)
+            st.session_state.history = []
+            st.rerun()
+
+        if ADMIN_MODE:
+            show_memory_admin()
+            show_materialization_admin(bq_manager)
+            show_model_admin(llm)
+            show_speculation_admin()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,8 @@
+"""
+Test configuration: makes the flat modules in src importable.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
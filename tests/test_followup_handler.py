@@ -0,0 +1,62 @@
+"""
+Tests for answering follow-ups locally against the previous result.
+"""
+
+import pandas as pd
+from followup_handler import answer_followup, plan_followup
+
+STUDENTS = pd.DataFrame(
+    {
+        "Name": ["A", "B", "C", "D", "Daisy", "F"],
+        "Department": ["AI", "CS", "CS", "EE", "AI", "CS"],
+        "CGPA": [3.1, 3.9, 2.5, 3.0, 2.8, 3.7],
+    }
+)
+
+
+def names(user_input):
+    refined, _ = answer_followup(user_input, STUDENTS)
+    return list(refined["Name"])
+
+
+def test_sort_by_column():
+    assert names("now sort that by CGPA") == ["C", "Daisy", "D", "A", "F", "B"]
+
+
+def test_top_n_by_column_keeps_highest():
+    assert names("top 2 by CGPA") == ["B", "F"]
+
+
+def test_bottom_n_by_column_keeps_lowest():
+    assert names("bottom 2 by CGPA") == ["C", "Daisy"]
+
+
+def test_filter_matches_exact_value():
+    assert names("only the CS ones") == ["B", "C", "F"]
+    # "AI" is a department value, not a substring of "Daisy"
+    assert names("only the AI ones") == ["A", "Daisy"]
+
+
+def test_filter_without_exact_value_goes_to_sql():
+    assert plan_followup("only the Mechanical ones", STUDENTS) is None
+
+
+def test_numeric_comparison_before_sort():
+    assert names("sort by CGPA desc with CGPA above 3") == ["B", "F", "A"]
+
+
+def test_sort_after_limit_keeps_clause_order():
+    assert names("top 2 by CGPA then sort by Name") == ["B", "F"]
+
+
+def test_unrecognised_clause_goes_to_sql():
+    assert plan_followup("now sort that by CGPA in Mechanical", STUDENTS) is None
+    assert plan_followup("only the CS ones who graduated", STUDENTS) is None
+
+
+def test_unknown_column_goes_to_sql():
+    assert plan_followup("now sort that by Fee", STUDENTS) is None
+
+
+def test_new_question_is_not_a_followup():
+    assert plan_followup("How many students are in CS?", STUDENTS) is None
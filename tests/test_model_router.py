@@ -0,0 +1,113 @@
+"""
+Tests for the model router using fake models in place of the Gemini clients.
+"""
+
+import pytest
+from model_router import (
+    FALLBACK_PHRASE,
+    ModelRouter,
+    ModelStats,
+    load_schema_catalog,
+    validate_sql,
+)
+
+CATALOG = load_schema_catalog()
+
+PROMPT_EXAMPLE_SQL = (
+    "`SELECT s.Name FROM llm-testing-447813.LLM.Students AS s "
+    "WHERE s.WarningCount > 0;`"
+)
+
+
+class FakeResponse:
+    """Mimics a LangChain message with a content attribute."""
+
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeModel:
+    """Returns a fixed output (or raises it) and counts its calls."""
+
+    def __init__(self, output):
+        self.output = output
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        if isinstance(self.output, Exception):
+            raise self.output
+        return FakeResponse(self.output)
+
+
+def make_router(fast_output, large_output="SELECT 1"):
+    fast, large = FakeModel(fast_output), FakeModel(large_output)
+    router = ModelRouter(
+        {"fast": fast, "large": large}, catalog=CATALOG, stats=ModelStats()
+    )
+    return router, fast, large
+
+
+def test_validate_sql_accepts_prompt_formatted_query():
+    assert validate_sql(PROMPT_EXAMPLE_SQL, CATALOG)
+    assert validate_sql("```sql\nSELECT 1\n```", CATALOG)
+
+
+def test_validate_sql_ignores_quotes_in_literals_and_comments():
+    sql = (
+        "SELECT s.Name FROM `llm-testing-447813.LLM.Students` AS s "
+        "-- the student's name\n"
+        "WHERE s.Name = 'O\\'Brien'"
+    )
+    assert validate_sql(sql, CATALOG)
+    assert not validate_sql("SELECT 'unterminated FROM x", CATALOG)
+
+
+def test_validate_sql_rejects_invalid_output():
+    assert not validate_sql("", CATALOG)
+    assert not validate_sql(FALLBACK_PHRASE, CATALOG)
+    assert not validate_sql("Here is your query", CATALOG)
+    assert not validate_sql("SELECT COUNT(* FROM x", CATALOG)
+    assert not validate_sql("SELECT * FROM `llm-testing-447813.LLM.Teachers`", CATALOG)
+
+
+def test_valid_fast_output_is_not_escalated():
+    router, fast, large = make_router(PROMPT_EXAMPLE_SQL)
+    response = router.for_stage("sql").invoke([])
+    assert response.content == PROMPT_EXAMPLE_SQL
+    assert (fast.calls, large.calls) == (1, 0)
+    assert router.stats()["sql/fast"]["success_rate"] == 1.0
+
+
+def test_fallback_phrase_escalates_to_large_model():
+    router, fast, large = make_router(FALLBACK_PHRASE, PROMPT_EXAMPLE_SQL)
+    response = router.for_stage("sql").invoke([])
+    assert response.content == PROMPT_EXAMPLE_SQL
+    assert (fast.calls, large.calls) == (1, 1)
+    stats = router.stats()
+    assert stats["sql/fast"]["success_rate"] == 0.0
+    assert stats["sql/large"]["success_rate"] == 1.0
+
+
+def test_failing_fast_model_escalates():
+    router, fast, large = make_router(RuntimeError("quota"), "A summary.")
+    assert router.for_stage("summary").invoke([]).content == "A summary."
+    assert router.stats()["summary/fast"]["calls"] == 1
+
+
+def test_last_tier_output_is_returned_even_if_invalid():
+    router, _, _ = make_router(FALLBACK_PHRASE, FALLBACK_PHRASE)
+    assert router.for_stage("sql").invoke([]).content == FALLBACK_PHRASE
+
+
+def test_unknown_tier_fails_at_construction():
+    with pytest.raises(ValueError, match="pro"):
+        ModelRouter({"fast": FakeModel("x")}, stage_tiers={"sql": "pro"})
+
+
+def test_routers_share_process_wide_stats_by_default():
+    first = ModelRouter({"fast": FakeModel("A summary.")})
+    second = ModelRouter({"fast": FakeModel("A summary.")})
+    before = second.stats().get("summary/fast", {"calls": 0})["calls"]
+    first.for_stage("summary").invoke([])
+    assert second.stats()["summary/fast"]["calls"] == before + 1